@@ -22,27 +22,22 @@ Revision History:
 ===================================================
 """
 
+import calendar
 import streamlit as st
-import matplotlib.pyplot as plt
+from matplotlib import cbook
+from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
-import seaborn as sns
+from io import BytesIO
 from pathlib import Path
 from PIL import Image
-from text_functions import (
-    information_related_to_project_outline,
-    information_on_time_series_data,
-    show_line_chart_information,
-    interactive_line_chart_title,
-    static_bar_chart_title,
-    show_bar_chart_information,
-    box_chart_title,
-    interactive_bar_chart_title,
-    box_chart_information,
-    line_chart_time_series_title,
-)
+from text_functions import get_html
 
 PAGE_ICON = ":chart_with_upwards_trend:"
 PAGE_TITLE = "Data Engineer, Educator Analyst and Technology Enthusiast"
+MONTHS = np.array(
+    ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+)
 
 # Set the title and icon of the application
 st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout="centered")
@@ -54,18 +49,71 @@ website_image = current_dir / "assets" / "images" / "Website.jpg"
 csv_file = current_dir / "assets" / "data" / "fcc-forum-pageviews.csv"
 css_file = current_dir / "styles" / "main.css"
 
-# Read the css file and add it to the streamlit application
-with open(css_file) as f:
-    st.markdown("<style>{}</style>".format(f.read()), unsafe_allow_html=True)
 
-# Read the csv file and set the date column as the index
-df = pd.read_csv(csv_file, parse_dates=["date"], index_col=["date"])
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_css(path, mtime):
+    """Read the css file, keyed on its modification time so edits are picked up."""
+    with open(path) as f:
+        return f.read()
 
-# Remove any outliers from the data keeping values within the 2.5 and 97.5 percentiles
-df = df[
-    (df["value"] >= df["value"].quantile(0.025))
-    & (df["value"] <= df["value"].quantile(0.975))
-]
+
+# Read the css file and add it to the streamlit application
+css = load_css(str(css_file), css_file.stat().st_mtime)
+st.markdown("<style>{}</style>".format(css), unsafe_allow_html=True)
+
+
+def render(key):
+    """Render one of the page's HTML blocks."""
+    # The blocks are trusted, finished HTML, so emit them directly rather than
+    # passing them through the markdown renderer first
+    st.html(get_html(key))
+
+
+# The loaded frame is only ever read, so share one copy rather than having
+# st.cache_data unpickle a fresh copy on every rerun. Everything cached on the
+# data keeps a single entry, so a replaced CSV drops the old results
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_df(path, mtime):
+    """Load the page views and remove outliers, keyed on the file's mtime."""
+    # Read the csv file with the multithreaded pyarrow parser and set the date
+    # column as the index
+    df = pd.read_csv(
+        path,
+        engine="pyarrow",
+        usecols=["date", "value"],
+        parse_dates=["date"],
+        date_format="%Y-%m-%d",
+        dtype={"value": "int32"},
+    ).set_index("date")
+    # The export is already in date order, so only pay for a sort if it is not
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+
+    # Remove any outliers keeping values within the 2.5 and 97.5 percentiles
+    values = df["value"].to_numpy()
+    lo, hi = np.quantile(values, [0.025, 0.975])
+    # Build the mask on the raw array, and the second comparison in place
+    mask = values >= lo
+    mask &= values <= hi
+    return df.iloc[mask]
+
+
+# Pass the path as a string so streamlit can hash the cache key, the helpers
+# cached below take the same mtime so they are rebuilt when the data changes
+csv_mtime = csv_file.stat().st_mtime
+df = load_df(str(csv_file), csv_mtime)
+
+
+# st.image would re-encode and downscale a PIL image on every rerun, so cache the
+# bytes it actually serves. Nothing decoded is kept once they are encoded
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_image(path, mtime, max_width=1460):
+    """Return the image as JPEG bytes, downscaled to at most max_width wide."""
+    with Image.open(path) as image:
+        image.thumbnail((max_width, image.height))
+        buffer = BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
 
 
 def prepare_data(df):
@@ -77,17 +125,81 @@ def prepare_data(df):
     if "value" not in df.columns:
         raise ValueError("Dataframe must have a 'value' column")
 
-    df["date"] = pd.to_datetime(df["date"])
+    # Only parse the dates if the caller has not already done so
+    if not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"])
     df.set_index("date", inplace=True)
     df.sort_index(inplace=True)
     return df
 
 
+@st.cache_data(show_spinner=False, max_entries=1)
+def resampled_views(mtime):
+    """Return the monthly and yearly mean page views, computed once."""
+    # Group on period keys rather than resampling, which would build the full
+    # target index and fill empty buckets before aggregating
+    views = df[["value"]]
+    df_month = views.groupby(df.index.to_period("M")).mean().to_timestamp()
+    df_year = views.groupby(df.index.to_period("Y")).mean().to_timestamp()
+    return df_month, df_year
+
+
+# This and box_stats are only called while building the cached chart images,
+# so they are left uncached rather than hashing the frame for a key of their own
+def year_month_means(df):
+    """Return the mean page views with a row per year and a column per month."""
+    years = df.index.year.to_numpy()
+    year0 = years.min()
+    n_years = years.max() - year0 + 1
+    # Flatten (year, month) into a single bucket so np.bincount sums every bucket
+    # in one pass over the values
+    key = (years - year0) * 12 + df.index.month.to_numpy() - 1
+    sums = np.bincount(key, weights=df["value"].to_numpy(), minlength=n_years * 12)
+    counts = np.bincount(key, minlength=n_years * 12)
+    with np.errstate(invalid="ignore"):
+        means = (sums / counts).reshape(n_years, 12)
+    return (
+        pd.DataFrame(
+            means,
+            index=pd.Index(np.arange(year0, year0 + n_years), name="year"),
+            columns=pd.Index(np.arange(1, 13), name="month"),
+        )
+        .dropna(how="all")
+        .dropna(axis=1, how="all")
+    )
+
+
+def box_stats(df):
+    """Return the box and whisker statistics for each year and each month."""
+    by_year = df.groupby(df.index.year)["value"]
+    by_month = df.groupby(df.index.month)["value"]
+    stats_year = cbook.boxplot_stats(
+        [group.to_numpy() for _, group in by_year], labels=list(by_year.groups)
+    )
+    stats_month = cbook.boxplot_stats(
+        [group.to_numpy() for _, group in by_month],
+        labels=list(MONTHS[np.array(list(by_month.groups)) - 1]),
+    )
+    return stats_year, stats_month
+
+
+def session_figure(key):
+    """Return this session's figure for key, cleared and ready to draw on."""
+    # Figure objects created directly are not tracked by pyplot, so reusing one
+    # per session keeps the figure count bounded across reruns
+    if key not in st.session_state:
+        st.session_state[key] = Figure()
+    fig = st.session_state[key]
+    fig.clear()
+    return fig
+
+
 def draw_line_plot(df, title="Line Plot", xlabel="Date", ylabel="Page Views"):
     """Draw a line plot."""
     if df is None:
         raise ValueError("Dataframe is missing")
-    fig, ax = plt.subplots()
+    fig = Figure()
+    ax = fig.subplots()
     ax.plot(df.index, df["value"], "r", linewidth=1)
     ax.set_title(title)
     ax.set_xlabel(xlabel)
@@ -97,76 +209,69 @@ def draw_line_plot(df, title="Line Plot", xlabel="Date", ylabel="Page Views"):
 
 def draw_interactive_line_chart(df, aggregation_level):
     """Draw an interactive line chart."""
+    df_month, df_year = resampled_views(csv_mtime)
     if aggregation_level == "day":
-        df.plot(kind="line", xlabel="date", ylabel="Page Views")
+        data = df
     elif aggregation_level == "month":
-        df_month = df.resample("M").mean()
-        df_month.plot(kind="line", xlabel="date", ylabel="Page Views")
+        data = df_month
     elif aggregation_level == "year":
-        df_year = df.resample("Y").mean()
-        df_year.plot(kind="line", xlabel="date", ylabel="Page Views")
+        data = df_year
     else:
         st.warning("Invalid aggregation level selected")
-    plt.title("Daily freecodeCamp Forum Page Views")
-    st.pyplot(plt.gcf())
-
-
-def draw_bar_plot(df, title="Bar Plot", xlabel="Year", ylabel="Average Page Views"):
+        return
+    fig = session_figure("interactive_line_figure")
+    ax = fig.add_subplot()
+    data.plot(kind="line", ax=ax, xlabel="date", ylabel="Page Views")
+    ax.set_title("Daily freecodeCamp Forum Page Views")
+    st.pyplot(fig)
+
+
+def draw_bar_plot(
+    df,
+    title="Bar Plot",
+    xlabel="Year",
+    ylabel="Average Page Views",
+    show_labels=False,
+):
     """Draw a bar plot."""
     if df is None:
         raise ValueError("Dataframe is missing")
-    df["month"] = df.index.month
-    df["year"] = df.index.year
-    df_bar = df.groupby(["year", "month"])["value"].mean()
-    df_bar = df_bar.unstack()
-    ax = df_bar.plot(kind="bar", stacked=True)
+    df_bar = year_month_means(df)
+    fig = Figure()
+    ax = fig.subplots()
+    df_bar.plot(kind="bar", stacked=True, ax=ax)
     ax.set_title(title)
     ax.set_xlabel(xlabel)
     ax.set_ylabel(ylabel)
-    plt.xticks(rotation=0)
-    plt.legend(
-        [
-            "January",
-            "February",
-            "March",
-            "April",
-            "May",
-            "June",
-            "July",
-            "August",
-            "September",
-            "October",
-            "November",
-            "December",
-        ]
-    )
-    for container in ax.containers:
-        for bar in container:
-            ax.text(
-                bar.get_x() + bar.get_width() / 2.0,
-                bar.get_y() + bar.get_height() / 2.0,
-                "%d" % int(bar.get_height()),
-                ha="center",
-                va="center",
-                fontsize=6,
-            )
-    return plt
+    ax.tick_params(axis="x", labelrotation=0)
+    # Name the legend entries from the months actually present in the table
+    ax.legend([calendar.month_name[month] for month in df_bar.columns])
+    # Labelling every bar creates a text artist per bar, so only do it on request
+    if show_labels:
+        # pandas draws one container per month column, in column order
+        for container, (_, column) in zip(ax.containers, df_bar.items()):
+            labels = ["" if np.isnan(value) else "%d" % value for value in column]
+            ax.bar_label(container, labels=labels, label_type="center", fontsize=6)
+    return fig
 
 
 def draw_interactive_bar_chart(df, aggregation_level):
     """Draw an interactive bar chart."""
+    df_month, df_year = resampled_views(csv_mtime)
     if aggregation_level == "day":
-        df.plot(kind="bar", xlabel="date", ylabel="Page Views")
+        data = df
     elif aggregation_level == "month":
-        df_month = df.resample("M").mean()
-        df_month.plot(kind="bar", xlabel="date", ylabel="Page Views")
+        data = df_month
     elif aggregation_level == "year":
-        df_year = df.resample("Y").mean()
-        df_year.plot(kind="bar", xlabel="date", ylabel="Page Views")
+        data = df_year
     else:
         st.warning("Invalid aggregation level selected")
-    plt.title("Daily freecodeCamp Forum Page Views")
-    st.pyplot(plt.gcf())
+        return
+    fig = session_figure("interactive_bar_figure")
+    ax = fig.add_subplot()
+    data.plot(kind="bar", ax=ax, xlabel="date", ylabel="Page Views")
+    ax.set_title("Daily freecodeCamp Forum Page Views")
+    st.pyplot(fig)
 
 
 def draw_box_plot(
@@ -175,35 +280,74 @@ def draw_box_plot(
     """Draw a box and whisker plot."""
     if df is None:
         raise ValueError("Dataframe is missing")
-    df_box = df.copy()
-    df_box.reset_index(inplace=True)
-    df_box["year"] = df_box["date"].dt.year
-    df_box["month"] = df_box["date"].dt.strftime("%b")
-    df_box["month_num"] = df_box["date"].dt.month
-    df_box = df_box.sort_values("month_num")
-
-    fig, axes = plt.subplots(nrows=1, ncols=2, figsize=(10, 5))
-    sns.boxplot(x="value", y="year", data=df_box, ax=axes[0])
-    sns.boxplot(x="value", y="month", data=df_box, ax=axes[1])
+    stats_year, stats_month = box_stats(df)
+
+    fig = Figure(figsize=(10, 5))
+    axes = fig.subplots(nrows=1, ncols=2)
+    for ax, stats in zip(axes, (stats_year, stats_month)):
+        ax.bxp(stats, orientation="horizontal")
+        # Keep the earliest year and January at the top
+        ax.invert_yaxis()
     axes[0].set_title(f"{title} (Trend)")
     axes[0].set_xlabel(xlabel)
     axes[0].set_ylabel("Year")
     axes[1].set_title(f"{title} (Seasonality)")
+    axes[1].set_xlabel(xlabel)
+    axes[1].set_ylabel("Month")
     return fig
 
 
+def figure_png(fig):
+    """Render a figure to PNG bytes with the same settings st.pyplot uses."""
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    return buffer.getvalue()
+
+
+# The static charts only depend on the loaded data, so render each one once and
+# cache the PNG bytes. Sessions then share immutable bytes rather than a Figure,
+# which is not safe to save from several threads at once. The bar plot keeps
+# two entries, one with and one without its labels
+@st.cache_data(show_spinner=False, max_entries=1)
+def line_plot_image(mtime, title="Line Plot", xlabel="Date", ylabel="Page Views"):
+    """Return the cached static line plot as PNG bytes."""
+    return figure_png(draw_line_plot(df, title, xlabel, ylabel))
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def bar_plot_image(
+    mtime,
+    title="Bar Plot",
+    xlabel="Year",
+    ylabel="Average Page Views",
+    show_labels=False,
+):
+    """Return the cached static bar plot as PNG bytes."""
+    return figure_png(draw_bar_plot(df, title, xlabel, ylabel, show_labels))
+
+
+@st.cache_data(show_spinner=False, max_entries=1)
+def box_plot_image(
+    mtime, title="Box and Whisker Plot", xlabel="Value", ylabel="Time Period"
+):
+    """Return the cached static box and whisker plot as PNG bytes."""
+    return figure_png(draw_box_plot(df, title, xlabel, ylabel))
+
+
 st.markdown(
     "<h1>Time-Series Analysis of FreeCodeCamp Forum Page Views</h1>",
     unsafe_allow_html=True,
 )
 
 st.markdown("## Project Outline")
-information_related_to_project_outline()
+render("project_outline")
 st.markdown("---")
 
-image = Image.open(website_image)
-st.image(image, caption="Website Overview Image")
-information_on_time_series_data()
+st.image(
+    load_image(str(website_image), website_image.stat().st_mtime),
+    caption="Website Overview Image",
+)
+render("chart_type")
 st.markdown("---")
 
 st.markdown("## Sample Data")
@@ -211,30 +355,44 @@ st.dataframe(df.head(5))
 st.markdown("---")
 
 st.markdown("## Data Information")
-information_on_time_series_data()
+render("chart_type")
 st.markdown("---")
 
+
+# Widgets inside a fragment only rerun the fragment, so changing these options
+# redraws their chart without re-rendering the rest of the page
+@st.fragment
+def static_bar_chart():
+    """Show the static bar plot with its label toggle."""
+    show_labels = st.checkbox("Show bar labels")
+    st.image(bar_plot_image(csv_mtime, show_labels=show_labels))
+
+
+@st.fragment
+def interactive_chart(draw_chart):
+    """Show an interactive chart with its aggregation level selector."""
+    aggregation_level = st.selectbox(
+        "Select the aggregation level:", ["day", "month", "year"]
+    )
+    draw_chart(df, aggregation_level)
+
+
 plot_type = st.selectbox("Select a chart type:", ["Line", "Bar", "Box"])
-aggregation_level = st.selectbox(
-    "Select the aggregation level:", ["day", "month", "year"]
-)
 st.markdown("---")
 
 if plot_type == "Line":
-    line_chart_time_series_title()
-    st.pyplot(draw_line_plot(df))
-    show_line_chart_information()
-    interactive_line_chart_title()
-    draw_interactive_line_chart(df, aggregation_level)
+    render("line_title")
+    st.image(line_plot_image(csv_mtime))
+    render("line_info_and_interactive_title")
+    interactive_chart(draw_interactive_line_chart)
 elif plot_type == "Bar":
-    static_bar_chart_title()
-    st.pyplot(draw_bar_plot(df))
-    show_bar_chart_information()
-    interactive_bar_chart_title()
-    draw_interactive_bar_chart(df, aggregation_level)
+    render("bar_title")
+    static_bar_chart()
+    render("bar_info_and_interactive_title")
+    interactive_chart(draw_interactive_bar_chart)
 else:
-    box_chart_title()
-    st.pyplot(draw_box_plot(df))
-    box_chart_information()
+    render("box_title")
+    st.image(box_plot_image(csv_mtime))
+    render("box_info")
 
 st.markdown("---")
@@ -20,13 +20,13 @@ Revision History:
 ===================================================
 """
 
-import streamlit as st
+import textwrap
+from types import MappingProxyType
 
-
-# create information related to project outline
-def information_related_to_project_outline():
-    st.markdown(
-        """
+# The page text is static, so every HTML block is built once at import time and
+# looked up by key when it is rendered
+_HTML = {
+    "project_outline": """
     <h2>Project Overview</h2>
     <p>This project aims to visualise the daily page views of the freeCodeCamp
     forum over a period of time, from May 2016 to December 2019. The data has
@@ -38,14 +38,7 @@ def information_related_to_project_outline():
     for each year, and the box and whisker plot will show the trend
     of page views over the years and seasonality of page views over the months.</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# information on time-series data
-def time_series_data_summary():
-    st.markdown(
-        """
+    "time_series_summary": """
     <h2>Time-Series Data Summary</h2>
     <p>The data provided below is a time series of daily page views on freecodecamp.
     Each row represents a day, and the first column is the date in the format
@@ -66,14 +59,7 @@ def time_series_data_summary():
     we might derive insights about how these external factors
     affect the website's page views.</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# information on time-series data
-def information_on_time_series_data():
-    st.markdown(
-        """
+    "chart_type": """
     <h2>Chart Type</h2>
     <p>Please use the dropdowns provided below to select the type of chart you
     would like to see, as well as see information on the benefits and
@@ -82,14 +68,10 @@ def information_on_time_series_data():
     <p>You are also able to agggregate the data by day, month or year,
     this will adjust the interactive chart provided below the inital example.</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# show line chart information
-def show_line_chart_information():
-    st.markdown(
-        """
+    "line_title": """
+    <h1>Reasons for using Line Charts with Time-Series Data</h1>
+    """,
+    "line_info": """
     <h2>Line Plots</h2>
     <ul>
         <li>1. Line charts are a simple and effective way to visualize
@@ -103,14 +85,13 @@ def show_line_chart_information():
     <p>Line charts are not suitable for showing the distribution of the
     data and can be misleading if the data points are too dense.</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# show bar chart information
-def show_bar_chart_information():
-    st.markdown(
-        """
+    "interactive_line_title": """
+        <h1>Interactive Line Chart</h1>
+    """,
+    "bar_title": """
+        <h1>Reasons for using Bar Charts with Time-series Data</h1>
+    """,
+    "bar_info": """
     <h2>Bar Charts</h2>
     <ul>
         <li>1. Bar charts are a simple and effective way to visualize
@@ -128,14 +109,13 @@ def show_bar_chart_information():
     <p>Bar charts can be misleading when the data is not evenly spaced
     or when the y-axis is not starting at 0</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# show box chart information
-def show_box_chart_information():
-    st.markdown(
-        """
+    "interactive_bar_title": """
+        <h1>Interactive Bar Chart</h1>
+    """,
+    "box_title": """
+        <h1>Reasons for Using Box and Whisker Plots with Time-Series Data</h1>
+    """,
+    "box_info": """
     <p>Box and whisker plots, also known as box plots, are a useful tool for
     visualizing the distribution of a dataset.
     They are particularly useful when working with large datasets or when
@@ -158,82 +138,25 @@ def show_box_chart_information():
     tool for quickly identifying patterns and trends in large and
     complex datasets.</p>
     """,
-        unsafe_allow_html=True,
-    )
-
-
-# show interactive line chart title
-def interactive_line_chart_title():
-    st.markdown(
-        """
-        <h1>Interactive Line Chart</h1>
-    """,
-        unsafe_allow_html=True,
-    )
-
-
-# show static bar chart title
-def static_bar_chart_title():
-    st.markdown(
-        """
-        <h1>Reasons for using Bar Charts with Time-series Data</h1>
-    """,
-        unsafe_allow_html=True,
-    )
-
-
-# show box chart title
-def box_chart_title():
-    st.markdown(
-        """
-        <h1>Reasons for Using Box and Whisker Plots with Time-Series Data</h1>
-    """,
-        unsafe_allow_html=True,
-    )
+}
 
+# Left-justify every block once, so the indentation from the source is never
+# sent to the page
+_HTML = {key: textwrap.dedent(html).strip() for key, html in _HTML.items()}
 
-# show interactive line chart title
-def interactive_bar_chart_title():
-    st.markdown(
-        """
-        <h1>Interactive Bar Chart</h1>
-    """,
-        unsafe_allow_html=True,
-    )
-
+# Blocks that always appear back to back are joined once, so each pair is sent
+# to the page as a single element
+_HTML["line_info_and_interactive_title"] = "\n".join(
+    (_HTML["line_info"], _HTML["interactive_line_title"])
+)
+_HTML["bar_info_and_interactive_title"] = "\n".join(
+    (_HTML["bar_info"], _HTML["interactive_bar_title"])
+)
 
-# show box chart information
-def box_chart_information():
-    st.markdown(
-        """
-    <p>Box and whisker plots, also known as box plots, are a useful
-    tool for visualizing the distribution of a dataset.
-    They are particularly useful when working with large datasets or
-    when you want to compare multiple sets of data at once.
-    Box plots show the distribution of a dataset based on five key number
-    summary: minimum, first quartile, median, third quartile, and maximum.</p>
-    <p>When working with time-series data, box plots are particularly useful
-    because they allow you to easily identify outliers and patterns in the data.
-    For example, if you have a dataset of daily pagenviews for a website, you
-    can use a box plot to quickly see if there are any days that have significantly
-    more or less page views than the others. Additionally, by grouping the data
-    by different time periods, such as weekdays or months, you can identify patterns
-    in the data that may not be immediately apparent.</p>
-    <p>Another benefit of using box plots with time-series data is that they are
-    not affected by the scale of the data. This means that you can easily
-    compare datasets that have different units or ranges without having to
-    normalize the data first. This makes box plots a useful tool for quickly
-    identifying patterns and trends in large and complex datasets.</p>
-    """,
-        unsafe_allow_html=True,
-    )
+# Expose the table read-only so no caller can change the shared page text
+_HTML = MappingProxyType(_HTML)
 
 
-# line chart time-series title
-def line_chart_time_series_title():
-    st.markdown(
-        """
-    <h1>Reasons for using Line Charts with Time-Series Data</h1>
-    """,
-        unsafe_allow_html=True,
-    )
+def get_html(key):
+    """Return the HTML block stored under key."""
+    return _HTML[key]